@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# Бенчмарк старта: время от `python main.py` до первого завершенного тика скринера.
+# Нужен рабочий BOT_TOKEN в .env. --cold сбрасывает кэш рынков перед первым прогоном,
+# --stale делает его устаревшим перед каждым прогоном.
+FIRST_TICK_MARKER = "Первый тик завершен"
+MARKETS_CACHE_DIR = os.path.join("data", "markets")
+
+def age_markets_cache():
+    # Делаем кэш устаревшим (старше TTL), но оставляем сами рынки
+    if not os.path.isdir(MARKETS_CACHE_DIR): return
+    for name in os.listdir(MARKETS_CACHE_DIR):
+        if not name.endswith(".json"): continue
+        path = os.path.join(MARKETS_CACHE_DIR, name)
+        with open(path, encoding="utf-8") as f: cache = json.load(f)
+        cache['timestamp'] = 0
+        with open(path, "w", encoding="utf-8") as f: json.dump(cache, f)
+
+def clear_markets_cache():
+    if not os.path.isdir(MARKETS_CACHE_DIR): return
+    for name in os.listdir(MARKETS_CACHE_DIR):
+        os.remove(os.path.join(MARKETS_CACHE_DIR, name))
+
+def run_once(timeout):
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "main.py"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        text=True, encoding="utf-8", errors="replace"
+    )
+    # stderr читаем в потоке, чтобы дедлайн работал, даже если main.py замолчал
+    first_tick = {}
+    done = threading.Event()
+
+    def read_stderr():
+        for line in proc.stderr:
+            if FIRST_TICK_MARKER in line:
+                first_tick['elapsed'] = time.perf_counter() - start
+                break
+        done.set()
+
+    threading.Thread(target=read_stderr, daemon=True).start()
+    try:
+        done.wait(timeout)
+        return first_tick.get('elapsed')
+    finally:
+        proc.terminate()
+        try: proc.wait(timeout=10)
+        except subprocess.TimeoutExpired: proc.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="Время от запуска main.py до первого тика")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--cold", action="store_true", help="сбросить кэш рынков перед первым прогоном")
+    parser.add_argument("--stale", action="store_true", help="перед каждым прогоном делать кэш рынков устаревшим")
+    parser.add_argument("--timeout", type=float, default=180.0)
+    args = parser.parse_args()
+
+    if args.cold: clear_markets_cache()
+
+    results = []
+    for i in range(args.runs):
+        if args.stale: age_markets_cache()
+        elapsed = run_once(args.timeout)
+        label = "cold" if args.cold and i == 0 else "stale" if args.stale else "warm"
+        if elapsed is None:
+            print(f"run {i + 1} ({label}): первый тик не получен (таймаут {args.timeout:.0f}s или main.py завершился)")
+            continue
+        results.append(elapsed)
+        print(f"run {i + 1} ({label}): {elapsed:.2f}s")
+
+    if results:
+        print(f"min {min(results):.2f}s | max {max(results):.2f}s | avg {sum(results) / len(results):.2f}s")
+
+if __name__ == "__main__":
+    main()
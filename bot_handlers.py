@@ -67,6 +67,9 @@ async def show_settings_menu(message_or_cb):
     trend_status = "Вкл" if user['filter_24h_enabled'] else "Выкл"
     kb.button(text=f"📉 Тренд 24ч: {trend_status}", callback_data="menu_24h")
     
+    digest_status = f"{user['digest_window']}с" if user['digest_enabled'] else "Выкл"
+    kb.button(text=f"📬 Дайджест: {digest_status}", callback_data="menu_digest")
+    
     kb.adjust(1)
     
     if isinstance(message_or_cb, types.CallbackQuery):
@@ -326,3 +329,43 @@ async def toggle_24h(cb: types.CallbackQuery):
     user = await get_user_settings(cb.from_user.id)
     await update_user_setting(cb.from_user.id, "filter_24h_enabled", not user['filter_24h_enabled'])
     await show_settings_menu(cb)
+
+
+# --- ДАЙДЖЕСТ ---
+@router.callback_query(F.data == "menu_digest")
+async def menu_digest(cb: types.CallbackQuery):
+    user = await get_user_settings(cb.from_user.id)
+    
+    text = (
+        "<b>📬 Дайджест</b>\n\n"
+        "Сигналы за окно собираются в одно сообщение,\n"
+        "отсортированное по силе движения."
+    )
+    
+    kb = InlineKeyboardBuilder()
+    
+    status = "✅ АКТИВЕН" if user['digest_enabled'] else "❌ ВЫКЛЮЧЕН"
+    kb.button(text=status, callback_data="toggle_digest_bool")
+    
+    if user['digest_enabled']:
+        for s in [15, 30, 60, 120, 300]:
+            mark = "✅" if user['digest_window'] == s else ""
+            kb.button(text=f"{s}с {mark}", callback_data=f"set_dig_{s}")
+    
+    kb.button(text="🔙 Назад", callback_data="settings_main")
+    if user['digest_enabled']: kb.adjust(1, 3, 2, 1)
+    else: kb.adjust(1)
+    
+    await refresh_menu(cb, text, kb.as_markup())
+
+@router.callback_query(F.data == "toggle_digest_bool")
+async def toggle_digest_bool(cb: types.CallbackQuery):
+    user = await get_user_settings(cb.from_user.id)
+    await update_user_setting(cb.from_user.id, "digest_enabled", not user['digest_enabled'])
+    await menu_digest(cb)
+
+@router.callback_query(F.data.startswith("set_dig_"))
+async def set_digest_window(cb: types.CallbackQuery):
+    val = int(cb.data.split("_")[2])
+    await update_user_setting(cb.from_user.id, "digest_window", val)
+    await menu_digest(cb)
\ No newline at end of file
@@ -22,6 +22,8 @@ DEFAULT_SETTINGS = {
     'show_vol24': True,
     'show_listing': False,
     'show_hashtag': True,
+    'digest_enabled': False,   # Копить сигналы и слать одним сообщением
+    'digest_window': 30,       # Окно дайджеста, сек
     'exchanges': '["binance", "bybit", "mexc"]'
 }
 
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Стакан по символам, которые недавно дали алерт. Держим в памяти, фоном обновляем
+# только повторно алертившие: одиночный алерт не должен стоить десятков запросов
+DEPTH_CACHE_MAX_SYMBOLS = 50
+DEPTH_CACHE_HOT_SEC = 10 * 60   # Сколько держим символ "горячим" после последнего алерта
+DEPTH_REFRESH_SEC = 30          # Не чаще одного снапшота на символ за этот период
+DEPTH_REFRESH_PER_TICK = 3      # Максимум фоновых снапшотов на биржу за проход цикла
+DEPTH_LOOP_SEC = 1.0
+DEPTH_LIMIT = 5
+
+def book_imbalance(bids, asks):
+    bid_vol = sum([x[1] for x in bids])
+    ask_vol = sum([x[1] for x in asks])
+    if ask_vol > 0: return ((bid_vol - ask_vol) / ask_vol) * 100
+    return 0
+
+class DepthCache:
+    def __init__(self, exchanges, max_symbols=DEPTH_CACHE_MAX_SYMBOLS, hot_sec=DEPTH_CACHE_HOT_SEC,
+                 refresh_sec=DEPTH_REFRESH_SEC, per_tick=DEPTH_REFRESH_PER_TICK,
+                 loop_sec=DEPTH_LOOP_SEC, limit=DEPTH_LIMIT):
+        self.exchanges = exchanges
+        self.max_symbols = max_symbols
+        self.hot_sec = hot_sec
+        self.refresh_sec = refresh_sec
+        self.per_tick = per_tick
+        self.loop_sec = loop_sec
+        self.limit = limit
+        self.books = OrderedDict()  # (exchange, symbol) -> {'bids', 'asks', 'updated', 'hot_until', 'repeat'}
+        self.task = None
+        self.refreshing = {}  # exchange -> текущая пачка обновлений
+
+    def start(self):
+        if not self.task: self.task = asyncio.create_task(self.refresh_loop())
+
+    async def stop(self):
+        pending = list(self.refreshing.values())
+        if self.task: pending.append(self.task)
+        for task in pending: task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self.task = None
+        self.refreshing = {}
+
+    async def fetch_snapshot(self, key, entry):
+        exchange_name, symbol = key
+        ob = await self.exchanges[exchange_name].fetch_order_book(symbol, limit=self.limit)
+        entry['bids'] = ob['bids'][:self.limit]
+        entry['asks'] = ob['asks'][:self.limit]
+        entry['updated'] = time.monotonic()
+
+    async def get_imbalance(self, exchange_name, symbol):
+        """Дисбаланс стакана в %. Сеть дергаем только если в кэше нет свежего снапшота."""
+        key = (exchange_name, symbol)
+        now = time.monotonic()
+        entry = self.books.get(key)
+        if entry is None:
+            entry = self.books[key] = {'bids': [], 'asks': [], 'updated': None, 'hot_until': 0, 'repeat': False}
+        else:
+            entry['repeat'] = True
+        entry['hot_until'] = now + self.hot_sec
+        self.books.move_to_end(key)
+
+        # Выкидываем тех, кто алертил давнее всех
+        while len(self.books) > self.max_symbols:
+            self.books.popitem(last=False)
+
+        if entry['updated'] is None or now - entry['updated'] >= self.refresh_sec:
+            try:
+                await self.fetch_snapshot(key, entry)
+            except Exception:
+                # Без первого снапшота символ только занимает слот, фон его не обновляет
+                if entry['updated'] is None and self.books.get(key) is entry: del self.books[key]
+                raise
+        return book_imbalance(entry['bids'], entry['asks'])
+
+    async def refresh_batch(self, items):
+        results = await asyncio.gather(*[self.fetch_snapshot(key, entry) for key, entry in items], return_exceptions=True)
+        for (key, _), res in zip(items, results):
+            if isinstance(res, Exception): logger.debug(f"Depth refresh failed {key}: {res}")
+
+    def refresh_once(self):
+        """Один проход фонового обновления: чистит остывшие символы и запускает пачки снапшотов."""
+        now = time.monotonic()
+        stale = {}
+        for key, entry in list(self.books.items()):
+            if entry['hot_until'] < now:
+                del self.books[key]
+                continue
+            # updated=None: первый снапшот еще грузит get_imbalance
+            if not entry['repeat'] or entry['updated'] is None: continue
+            if now - entry['updated'] < self.refresh_sec: continue
+            stale.setdefault(key[0], []).append((key, entry))
+
+        # Каждая биржа обновляется своей пачкой, медленная площадка не держит остальные.
+        # Пачка не больше per_tick, самые старые снапшоты первыми: не забиваем очередь rate limit
+        for exchange_name, items in stale.items():
+            batch = self.refreshing.get(exchange_name)
+            if batch and not batch.done(): continue
+            items.sort(key=lambda item: item[1]['updated'])
+            self.refreshing[exchange_name] = asyncio.create_task(self.refresh_batch(items[:self.per_tick]))
+
+    async def refresh_loop(self):
+        while True:
+            self.refresh_once()
+            await asyncio.sleep(self.loop_sec)
@@ -37,6 +37,9 @@ async def main():
     finally:
         logger.info("🛑 Остановка...")
         screener_task.cancel()
+        # Ждем, пока скринер досылает дайджесты, и только потом закрываем сессию
+        try: await screener_task
+        except asyncio.CancelledError: pass
         await bot.session.close()
 
 if __name__ == "__main__":
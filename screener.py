@@ -1,31 +1,104 @@
 import asyncio
 import ccxt.async_support as ccxt
-import pandas as pd
-import numpy as np
 import logging
 import json
+import os
+import time
 from datetime import datetime, timedelta
 from database import get_all_users
+from depth_cache import DepthCache
 
 logger = logging.getLogger(__name__)
 
 PRICE_BUFFER = {}
 BUFFER_RETENTION_MIN = 130 
 
+# Кэш списка рынков (load_markets тянет несколько МБ с каждой биржи)
+MARKETS_CACHE_DIR = "data/markets"
+MARKETS_CACHE_TTL_SEC = 6 * 60 * 60
+
+def read_markets_cache(exchange_name):
+    path = os.path.join(MARKETS_CACHE_DIR, f"{exchange_name}.json")
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_markets_cache(exchange_name, markets, currencies):
+    os.makedirs(MARKETS_CACHE_DIR, exist_ok=True)
+    path = os.path.join(MARKETS_CACHE_DIR, f"{exchange_name}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'timestamp': time.time(), 'markets': markets, 'currencies': currencies}, f, default=str)
+    os.replace(tmp_path, path)
+
 class MarketEngine:
     def __init__(self, bot):
         self.bot = bot
         self.exchanges = {}
         self.running = True
+        self.markets_task = None
+        self.first_tick_done = False
+        self.digests = {}
+        self.digest_tasks = set()
+        self.depth_cache = DepthCache(self.exchanges)
     
     async def init_exchanges(self):
         options = {'enableRateLimit': True, 'options': {'defaultType': 'future'}, 'timeout': 30000}
         self.exchanges['binance'] = ccxt.binance(options)
         self.exchanges['bybit'] = ccxt.bybit(options)
         self.exchanges['mexc'] = ccxt.mexc(options)
+
+        # Кэш рынков ставим до первого тика, иначе fetch_tickers сам пойдет качать load_markets
+        names = list(self.exchanges)
+        caches = await asyncio.gather(*[asyncio.to_thread(read_markets_cache, name) for name in names])
+        to_refresh = [name for name, cache in zip(names, caches) if not self.apply_markets_cache(name, cache)]
+
+        # Сеть только фоном и параллельно. Биржи без кэша fetch_tickers дождется через тот же load_markets
+        if to_refresh:
+            self.markets_task = asyncio.gather(*[self.refresh_markets(name) for name in to_refresh])
+        self.depth_cache.start()
         logger.info("Система готова.")
 
+    def apply_markets_cache(self, exchange_name, cache):
+        """True, если кэш свежий и обновлять рынки не нужно."""
+        if not cache or not cache.get('markets'): return False
+        exchange = self.exchanges[exchange_name]
+        try:
+            # Даже устаревший кэш лучше ожидания: ставим его сразу, обновляем следом
+            exchange.set_markets(cache['markets'], cache.get('currencies'))
+        except Exception as e:
+            logger.error(f"{exchange_name}: битый кэш рынков: {e}")
+            exchange.markets = None
+            exchange.markets_by_id = None
+            return False
+        if time.time() - cache.get('timestamp', 0) < MARKETS_CACHE_TTL_SEC:
+            logger.info(f"{exchange_name}: рынки из кэша ({len(cache['markets'])})")
+            return True
+        return False
+
+    async def refresh_markets(self, exchange_name):
+        exchange = self.exchanges[exchange_name]
+        try:
+            if exchange.markets:
+                # Устаревший кэш уже стоит: качаем мимо load_markets, чтобы fetch_tickers
+                # не ждал общий markets_loading и не падал вместе с этой загрузкой
+                markets = await exchange.fetch_markets()
+                exchange.set_markets(markets, exchange.currencies)
+            else:
+                await exchange.load_markets()
+            await asyncio.to_thread(write_markets_cache, exchange_name, exchange.markets, exchange.currencies)
+            logger.info(f"{exchange_name}: рынки обновлены ({len(exchange.markets)})")
+        except Exception as e:
+            logger.error(f"{exchange_name}: не удалось загрузить рынки: {e}")
+
     async def close_exchanges(self):
+        if self.markets_task and not self.markets_task.done():
+            self.markets_task.cancel()
+        for task in list(self.digest_tasks): task.cancel()
+        await asyncio.gather(*self.digest_tasks, return_exceptions=True)
+        await self.depth_cache.stop()
         for name, exchange in self.exchanges.items():
             await exchange.close()
 
@@ -112,16 +185,19 @@ class MarketEngine:
                 await self.process_alert(*args)
 
             self.clean_buffer()
+            if not self.first_tick_done:
+                self.first_tick_done = True
+                logger.info("Первый тик завершен.")
             await asyncio.sleep(max(1.0, 5.0 - (datetime.now() - loop_start).total_seconds()))
 
     async def calculate_technicals(self, exchange_name, symbol, price, user_settings):
+        import numpy as np
         exchange = self.exchanges[exchange_name]
         try:
             rsi_tf = user_settings.get('rsi_timeframe', '5m')
             rsi_period = user_settings.get('rsi_period', 14)
             ohlcv = await exchange.fetch_ohlcv(symbol, timeframe=rsi_tf, limit=rsi_period + 10)
-            df = pd.DataFrame(ohlcv, columns=['time', 'open', 'high', 'low', 'close', 'vol'])
-            close = df['close'].to_numpy()
+            close = np.array([candle[4] for candle in ohlcv], dtype=float)
             delta = np.diff(close)
             gain = np.where(delta > 0, delta, 0)
             loss = np.where(delta < 0, -delta, 0)
@@ -139,10 +215,7 @@ class MarketEngine:
             
             imbalance_val = 0
             try:
-                ob = await exchange.fetch_order_book(symbol, limit=5)
-                bids = sum([x[1] for x in ob['bids']])
-                asks = sum([x[1] for x in ob['asks']])
-                if asks > 0: imbalance_val = ((bids - asks) / asks) * 100
+                imbalance_val = await self.depth_cache.get_imbalance(exchange_name, symbol)
             except: pass
 
             return {
@@ -172,6 +245,10 @@ class MarketEngine:
             if change > 0 and rsi > user['rsi_pump_limit']: return
             if change < 0 and rsi < user['rsi_dump_limit']: return
 
+        if user.get('digest_enabled'):
+            self.queue_digest(user, exchange, symbol, change, interval, tech)
+            return
+
         is_pump = change > 0
         side_color = "🟢" if is_pump else "🔴"
         action = "Рост цены" if is_pump else "Снижение цены"
@@ -209,9 +286,55 @@ class MarketEngine:
         except Exception as e:
             logger.error(f"Delivery failed: {e}")
 
+    def queue_digest(self, user, exchange, symbol, change, interval, tech):
+        bucket = self.digests.get(user['user_id'])
+        if bucket is None:
+            bucket = self.digests[user['user_id']] = {}
+            task = asyncio.create_task(self.flush_digest(user, user.get('digest_window') or 30))
+            self.digest_tasks.add(task)
+            task.add_done_callback(self.digest_tasks.discard)
+
+        # Повтор по той же паре за окно не дублируем, оставляем самое сильное движение
+        key = (exchange, symbol)
+        prev = bucket.get(key)
+        if prev and abs(prev['change']) > abs(change): return
+        bucket[key] = {'exchange': exchange, 'symbol': symbol, 'change': change, 'interval': interval, 'rsi': tech['rsi']}
+
+    async def flush_digest(self, user, window):
+        try:
+            await asyncio.sleep(window)
+        finally:
+            # При остановке не теряем накопленное: отправляем досрочно
+            await self.send_digest(user, window)
+
+    async def send_digest(self, user, window):
+        bucket = self.digests.pop(user['user_id'], {})
+        if not bucket: return
+
+        rows = []
+        for item in sorted(bucket.values(), key=lambda x: abs(x['change']), reverse=True):
+            pair_clean = item['symbol'].split('/')[0].replace(':USDT','')
+            arrow = "▲" if item['change'] > 0 else "▼"
+            row = f"{arrow} {pair_clean:<10} {item['exchange'][:3].upper()} {item['change']:+6.2f}% {item['interval']:>3}м"
+            if user['rsi_enabled']: row += f" RSI {item['rsi']:>5}"
+            rows.append(row)
+
+        # Лимит Telegram 4096 символов: режем таблицу на куски
+        chunk_size = 60
+        for i in range(0, len(rows), chunk_size):
+            msg = [
+                f"📬 <b>Дайджест за {window} сек</b> ({len(rows)} сигн.)",
+                "<pre>" + "\n".join(rows[i:i + chunk_size]) + "</pre>"
+            ]
+            try:
+                await self.bot.send_message(user['user_id'], "\n".join(msg), parse_mode="HTML")
+            except Exception as e:
+                logger.error(f"Digest delivery failed: {e}")
+
 async def run_screener(bot):
     engine = MarketEngine(bot)
-    await engine.init_exchanges()
-    try: await engine.process_market_data()
+    try:
+        await engine.init_exchanges()
+        await engine.process_market_data()
     except asyncio.CancelledError: pass
     finally: await engine.close_exchanges()
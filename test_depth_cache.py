@@ -0,0 +1,182 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from depth_cache import DepthCache
+
+# Локальный фейковый фид стакана: строка с символом -> строка JSON со стаканом
+class FakeDepthServer:
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.books = {}
+        self.requests = {}
+        self.server = None
+        self.port = None
+
+    async def handle(self, reader, writer):
+        symbol = (await reader.readline()).decode().strip()
+        self.requests[symbol] = self.requests.get(symbol, 0) + 1
+        if self.delay: await asyncio.sleep(self.delay)
+        book = self.books.get(symbol)
+        writer.write((json.dumps(book) + "\n").encode() if book else b"ERR\n")
+        await writer.drain()
+        writer.close()
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc):
+        self.server.close()
+        await self.server.wait_closed()
+
+class FakeExchange:
+    """Клиент с интерфейсом ccxt fetch_order_book, ходит в FakeDepthServer."""
+    def __init__(self, port):
+        self.port = port
+
+    async def fetch_order_book(self, symbol, limit=5):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write(f"{symbol}\n".encode())
+        await writer.drain()
+        line = (await reader.readline()).decode().strip()
+        writer.close()
+        if line == "ERR": raise ValueError(f"no book for {symbol}")
+        return json.loads(line)
+
+def book(bid_vol, ask_vol):
+    return {'bids': [[100.0, bid_vol]], 'asks': [[101.0, ask_vol]]}
+
+def run(coro):
+    return asyncio.run(coro)
+
+async def wait_until(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        if time.monotonic() > deadline: return False
+        await asyncio.sleep(0.01)
+    return True
+
+def test_cache_hit_within_refresh_period():
+    async def scenario():
+        async with FakeDepthServer() as srv:
+            srv.books["BTC/USDT"] = book(3, 1)
+            cache = DepthCache({'binance': FakeExchange(srv.port)}, refresh_sec=60)
+            first = await cache.get_imbalance('binance', "BTC/USDT")
+            srv.books["BTC/USDT"] = book(1, 1)
+            second = await cache.get_imbalance('binance', "BTC/USDT")
+            return first, second, srv.requests["BTC/USDT"]
+
+    first, second, requests = run(scenario())
+    assert first == pytest.approx(200.0)
+    assert second == first
+    assert requests == 1
+
+def test_refresh_after_refresh_period():
+    async def scenario():
+        async with FakeDepthServer() as srv:
+            srv.books["BTC/USDT"] = book(3, 1)
+            cache = DepthCache({'binance': FakeExchange(srv.port)}, refresh_sec=0.05, loop_sec=0.01)
+            await cache.get_imbalance('binance', "BTC/USDT")
+            await cache.get_imbalance('binance', "BTC/USDT")
+            srv.books["BTC/USDT"] = book(1, 2)
+            entry = cache.books[('binance', "BTC/USDT")]
+            cache.start()
+            refreshed = await wait_until(lambda: entry['asks'] == [[101.0, 2]])
+            await cache.stop()
+            return refreshed, entry
+
+    refreshed, entry = run(scenario())
+    assert refreshed
+    assert entry['bids'] == [[100.0, 1]]
+
+def test_single_alert_not_refreshed_in_background():
+    async def scenario():
+        async with FakeDepthServer() as srv:
+            srv.books["BTC/USDT"] = book(1, 1)
+            cache = DepthCache({'binance': FakeExchange(srv.port)}, refresh_sec=0)
+            await cache.get_imbalance('binance', "BTC/USDT")
+            cache.refresh_once()
+            return dict(cache.refreshing), srv.requests["BTC/USDT"]
+
+    refreshing, requests = run(scenario())
+    assert refreshing == {}
+    assert requests == 1
+
+def test_refresh_capped_per_tick():
+    async def scenario():
+        async with FakeDepthServer() as srv:
+            symbols = [f"S{i}/USDT" for i in range(5)]
+            for sym in symbols: srv.books[sym] = book(1, 1)
+            cache = DepthCache({'binance': FakeExchange(srv.port)}, refresh_sec=0, per_tick=2)
+            for sym in symbols:
+                await cache.get_imbalance('binance', sym)
+                await cache.get_imbalance('binance', sym)
+            before = sum(srv.requests.values())
+            cache.refresh_once()
+            await cache.refreshing['binance']
+            return sum(srv.requests.values()) - before
+
+    assert run(scenario()) == 2
+
+def test_lru_eviction_at_max_symbols():
+    async def scenario():
+        async with FakeDepthServer() as srv:
+            for sym in ["A/USDT", "B/USDT", "C/USDT"]: srv.books[sym] = book(1, 1)
+            cache = DepthCache({'binance': FakeExchange(srv.port)}, max_symbols=2)
+            await cache.get_imbalance('binance', "A/USDT")
+            await cache.get_imbalance('binance', "B/USDT")
+            await cache.get_imbalance('binance', "A/USDT")
+            await cache.get_imbalance('binance', "C/USDT")
+            return list(cache.books)
+
+    assert run(scenario()) == [('binance', "A/USDT"), ('binance', "C/USDT")]
+
+def test_expiry_after_hot_period():
+    async def scenario():
+        async with FakeDepthServer() as srv:
+            srv.books["BTC/USDT"] = book(1, 1)
+            cache = DepthCache({'binance': FakeExchange(srv.port)}, hot_sec=0.01)
+            await cache.get_imbalance('binance', "BTC/USDT")
+            await asyncio.sleep(0.05)
+            cache.refresh_once()
+            return dict(cache.books)
+
+    assert run(scenario()) == {}
+
+def test_failed_first_snapshot_frees_slot():
+    async def scenario():
+        async with FakeDepthServer() as srv:
+            cache = DepthCache({'binance': FakeExchange(srv.port)})
+            with pytest.raises(ValueError):
+                await cache.get_imbalance('binance', "MISSING/USDT")
+            return dict(cache.books)
+
+    assert run(scenario()) == {}
+
+def test_slow_exchange_does_not_block_others():
+    async def scenario():
+        async with FakeDepthServer() as fast, FakeDepthServer() as slow:
+            fast.books["A/USDT"] = book(1, 1)
+            slow.books["B/USDT"] = book(1, 1)
+            cache = DepthCache({'fast': FakeExchange(fast.port), 'slow': FakeExchange(slow.port)}, refresh_sec=0)
+            for name, sym in [('fast', "A/USDT"), ('slow', "B/USDT")]:
+                await cache.get_imbalance(name, sym)
+                await cache.get_imbalance(name, sym)
+            slow.delay = 30
+            cache.refresh_once()
+            slow_batch = cache.refreshing['slow']
+            await cache.refreshing['fast']
+            cache.refresh_once()
+            await cache.refreshing['fast']
+            result = fast.requests["A/USDT"], slow_batch.done(), cache.refreshing['slow'] is slow_batch
+            await cache.stop()
+            return result
+
+    fast_requests, slow_done, same_batch = run(scenario())
+    assert fast_requests == 4
+    assert not slow_done
+    assert same_batch